@@ -1,22 +1,45 @@
-from fastapi import FastAPI, APIRouter, HTTPException, File, UploadFile, Form
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, File, UploadFile, Form, Request, Query
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
 import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
 from typing import List, Optional
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta
 import requests
 import httpx
 import base64
+import binascii
 import io
-from PIL import Image, ImageDraw, ImageFont
+import mimetypes
+import zipfile
+from urllib.parse import urlparse
+from PIL import Image, ImageDraw, ImageFont, UnidentifiedImageError
 import tempfile
 import asyncio
+import numpy as np
+import threading
+import time
+import fcntl
+import gzip
+import hashlib
+import json
+import socket
+from collections import OrderedDict, deque
+from functools import lru_cache
+from contextlib import asynccontextmanager
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -37,6 +60,158 @@ IMGFLIP_API_BASE = "https://api.imgflip.com"
 IMGFLIP_USERNAME = os.environ.get('IMGFLIP_USERNAME', '')
 IMGFLIP_PASSWORD = os.environ.get('IMGFLIP_PASSWORD', '')
 
+# Shared cache configuration - one directory per host, shared by all uvicorn workers
+SHARED_CACHE_DIR = Path(os.environ.get('SHARED_CACHE_DIR', Path(tempfile.gettempdir()) / 'yesmemes-cache'))
+CATALOG_SNAPSHOT_PATH = SHARED_CACHE_DIR / 'catalog.json'
+RENDER_CACHE_DIR = SHARED_CACHE_DIR / 'renders'
+CATALOG_TTL_SECONDS = int(os.environ.get('CATALOG_TTL_SECONDS', '3600'))
+# After a failed Imgflip fetch, no worker retries upstream for this long
+CATALOG_FAILURE_PATH = SHARED_CACHE_DIR / 'catalog.failed'
+CATALOG_FAILURE_TTL_SECONDS = int(os.environ.get('CATALOG_FAILURE_TTL_SECONDS', '60'))
+RENDER_CACHE_TTL_SECONDS = int(os.environ.get('RENDER_CACHE_TTL_SECONDS', '86400'))
+RENDER_CACHE_SWEEP_SECONDS = int(os.environ.get('RENDER_CACHE_SWEEP_SECONDS', '3600'))
+MEMES_VERSION_PATH = SHARED_CACHE_DIR / 'memes.version'
+MEMES_VERSION_TTL_SECONDS = int(os.environ.get('MEMES_VERSION_TTL_SECONDS', '60'))
+
+# JSON responses smaller than this are sent uncompressed
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+
+# Meme event stream configuration
+SSE_HEARTBEAT_SECONDS = int(os.environ.get('SSE_HEARTBEAT_SECONDS', '15'))
+SSE_SUBSCRIBER_BUFFER = int(os.environ.get('SSE_SUBSCRIBER_BUFFER', '100'))
+SSE_REPLAY_BUFFER = int(os.environ.get('SSE_REPLAY_BUFFER', '256'))
+SSE_POLL_SECONDS = float(os.environ.get('SSE_POLL_SECONDS', '0.2'))
+SSE_LOG_MAX_BYTES = int(os.environ.get('SSE_LOG_MAX_BYTES', '1048576'))
+MEME_EVENTS_LOG_PATH = SHARED_CACHE_DIR / 'meme-events.log'
+MEME_EVENTS_SEQ_PATH = SHARED_CACHE_DIR / 'meme-events.seq'
+MEME_EVENTS_WATCHER_PATH = SHARED_CACHE_DIR / 'meme-events.watcher'
+# Identifies writes made on this host, so the change stream only forwards other hosts' writes
+HOST_ID = f"{socket.gethostname()}:{SHARED_CACHE_DIR}"
+
+# Preview render configuration - previews trade quality for latency, final renders are unaffected
+PREVIEW_BASE_CACHE_SIZE = int(os.environ.get('PREVIEW_BASE_CACHE_SIZE', '32'))
+PREVIEW_LAYER_CACHE_SIZE = int(os.environ.get('PREVIEW_LAYER_CACHE_SIZE', '512'))
+PREVIEW_REFERENCE_WIDTH = 500  # Width of the editor canvas that font sizes are expressed against
+
+# Server-side image fetches - only allowlisted HTTPS hosts, bounded in time, bytes and pixels
+IMAGE_FETCH_HOSTS = set(os.environ.get('IMAGE_FETCH_HOSTS', 'i.imgflip.com').split(','))
+IMAGE_FETCH_TIMEOUT_SECONDS = float(os.environ.get('IMAGE_FETCH_TIMEOUT_SECONDS', '10'))
+IMAGE_FETCH_MAX_BYTES = int(os.environ.get('IMAGE_FETCH_MAX_BYTES', str(10 * 1024 * 1024)))
+Image.MAX_IMAGE_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', '40000000'))
+
+# Perceptual-hash deduplication - distances are Hamming distances between 64-bit dHashes
+UPLOAD_SIMILAR_DISTANCE = int(os.environ.get('UPLOAD_SIMILAR_DISTANCE', '2'))
+SIMILAR_MAX_DISTANCE = int(os.environ.get('SIMILAR_MAX_DISTANCE', '10'))
+# Each worker has its own index; uploads stored by other workers appear within this interval
+UPLOAD_INDEX_REFRESH_SECONDS = int(os.environ.get('UPLOAD_INDEX_REFRESH_SECONDS', '30'))
+UPLOAD_INDEX_OVERLAP_SECONDS = 5
+# Hashes added per event loop turn while loading the index
+UPLOAD_INDEX_BATCH_SIZE = 500
+
+# Gallery export - memory use is bounded by one batch of images, not by gallery size
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '20'))
+EXPORT_FETCH_CONCURRENCY = int(os.environ.get('EXPORT_FETCH_CONCURRENCY', '8'))
+
+RENDER_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+# Templates served when the Imgflip API is unreachable
+FALLBACK_TEMPLATES = [
+    {
+        "id": "181913649",
+        "name": "Drake Hotline Bling",
+        "url": "https://i.imgflip.com/30b1gx.jpg",
+        "width": 1200,
+        "height": 1200,
+        "box_count": 2
+    },
+    {
+        "id": "87743020",
+        "name": "Two Buttons",
+        "url": "https://i.imgflip.com/1g8my4.jpg",
+        "width": 600,
+        "height": 908,
+        "box_count": 3
+    },
+    {
+        "id": "112126428",
+        "name": "Distracted Boyfriend",
+        "url": "https://i.imgflip.com/1ur9b0.jpg",
+        "width": 1200,
+        "height": 800,
+        "box_count": 3
+    },
+    {
+        "id": "131087935",
+        "name": "Running Away Balloon",
+        "url": "https://i.imgflip.com/24y43o.jpg",
+        "width": 761,
+        "height": 1024,
+        "box_count": 5
+    },
+    {
+        "id": "124822590",
+        "name": "Left Exit 12 Off Ramp",
+        "url": "https://i.imgflip.com/22bdq6.jpg",
+        "width": 804,
+        "height": 767,
+        "box_count": 3
+    },
+    {
+        "id": "135256802",
+        "name": "Epic Handshake",
+        "url": "https://i.imgflip.com/28j0te.jpg",
+        "width": 900,
+        "height": 645,
+        "box_count": 3
+    },
+    {
+        "id": "4087833",
+        "name": "Waiting Skeleton",
+        "url": "https://i.imgflip.com/2fm6x.jpg",
+        "width": 298,
+        "height": 403,
+        "box_count": 2
+    },
+    {
+        "id": "102156234",
+        "name": "Mocking Spongebob",
+        "url": "https://i.imgflip.com/1otk96.jpg",
+        "width": 502,
+        "height": 353,
+        "box_count": 2
+    },
+    {
+        "id": "93895088",
+        "name": "Expanding Brain",
+        "url": "https://i.imgflip.com/1jwhww.jpg",
+        "width": 857,
+        "height": 1202,
+        "box_count": 4
+    }
+]
+FALLBACK_TEMPLATES_DIGEST = hashlib.sha256(json.dumps(FALLBACK_TEMPLATES).encode('utf-8')).hexdigest()
+
+# Parsed copy of the catalog snapshot, re-read only when the file on disk changes
+_catalog_cache = {'mtime_ns': None, 'templates': None, 'digest': None}
+_render_cache_state = {'sweep_task': None}
+
+# Meme event feed state. Every worker on a host appends to one shared event log and tails
+# it, so event ids ("<epoch>-<seq>") are the same on every worker and resume works across them.
+_feed_state = {
+    'epoch': None, 'seq': 0, 'log_inode': None, 'log_position': 0,
+    'scope': 'host', 'tail_task': None, 'watch_task': None
+}
+_feed_history = deque(maxlen=SSE_REPLAY_BUFFER)
+_feed_subscribers = set()
+
+# Downscaled base images and rasterized text layers for previews, shared with render threads
+_preview_base_cache = OrderedDict()
+_preview_layer_cache = OrderedDict()
+_preview_cache_lock = threading.Lock()
+
+# Template dHashes, recomputed when the catalog changes
+_template_hash_cache = {'digest': None, 'hashes': {}}
+
 # Define Models
 class StatusCheck(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -81,6 +256,885 @@ class CustomMemeRequest(BaseModel):
     font_size: int = 36
     text_color: str = "#ffffff"
 
+class PreviewTextBox(MemeTextBox):
+    text: str = Field(max_length=200)
+
+class PreviewMemeRequest(BaseModel):
+    template_id: Optional[str] = None
+    # Previewing a stored upload by id avoids re-sending its data URL on every keystroke
+    upload_id: Optional[str] = None
+    image_url: Optional[str] = None
+    boxes: List[PreviewTextBox] = Field(max_length=20)
+    # Used to build a font file name, so no path separators
+    font_family: str = Field(default="Impact", max_length=64, pattern=r"^[A-Za-z0-9 _-]+$")
+    font_size: int = Field(default=36, ge=8, le=200)
+    max_size: int = Field(default=500, ge=64, le=1024)
+    format: str = "jpeg"
+    quality: int = Field(default=60, ge=1, le=95)
+
+# Shared cache helpers
+def _is_fresh(path: Path, ttl_seconds: int) -> bool:
+    """Check whether a cache file exists and is younger than the TTL"""
+    try:
+        age = datetime.now().timestamp() - path.stat().st_mtime
+    except FileNotFoundError:
+        return False
+    return age < ttl_seconds
+
+def _atomic_write(path: Path, payload: bytes):
+    """Write a file so that readers in other workers never see a partial result"""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+@asynccontextmanager
+async def _shared_lock(path: Path, wait: bool = True):
+    """Hold an exclusive cross-process lock on `path` without blocking the event loop
+
+    With wait=False the lock is only tried once; the context yields whether it was acquired.
+    """
+    lock_file = open(path.with_name(path.name + '.lock'), 'wb')
+    try:
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                acquired = True
+                break
+            except BlockingIOError:
+                if not wait:
+                    acquired = False
+                    break
+                await asyncio.sleep(0.05)
+        yield acquired
+    finally:
+        lock_file.close()
+
+def _read_catalog_snapshot(allow_stale: bool = False) -> Optional[list]:
+    """Load the shared template catalog, or None if it is missing (or stale, unless allowed)"""
+    if not allow_stale and not _is_fresh(CATALOG_SNAPSHOT_PATH, CATALOG_TTL_SECONDS):
+        return None
+
+    try:
+        f = open(CATALOG_SNAPSHOT_PATH, 'rb')
+    except FileNotFoundError:
+        return None
+
+    with f:
+        mtime_ns = os.fstat(f.fileno()).st_mtime_ns
+        if mtime_ns == _catalog_cache['mtime_ns']:
+            return _catalog_cache['templates']
+        payload = f.read()
+
+    templates = json.loads(payload)
+    digest = hashlib.sha256(payload).hexdigest()
+
+    _catalog_cache['mtime_ns'] = mtime_ns
+    _catalog_cache['templates'] = templates
+    _catalog_cache['digest'] = digest
+    return templates
+
+def _write_catalog_snapshot(templates: list):
+    """Publish a freshly fetched template catalog to all workers"""
+    payload = json.dumps(templates).encode('utf-8')
+    _atomic_write(CATALOG_SNAPSHOT_PATH, payload)
+    _catalog_cache['mtime_ns'] = CATALOG_SNAPSHOT_PATH.stat().st_mtime_ns
+    _catalog_cache['templates'] = templates
+    _catalog_cache['digest'] = hashlib.sha256(payload).hexdigest()
+
+def _render_cache_path(request: "CreateMemeRequest") -> Path:
+    """Cache file for a captioned meme, keyed by template and box texts"""
+    key = json.dumps([request.template_id, [box.text for box in request.boxes]])
+    return RENDER_CACHE_DIR / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json"
+
+def _sweep_render_cache() -> int:
+    """Delete expired caption cache entries and their lock files"""
+    removed = 0
+    cutoff = datetime.now().timestamp() - RENDER_CACHE_TTL_SECONDS
+    for path in RENDER_CACHE_DIR.iterdir():
+        try:
+            if path.stat().st_mtime >= cutoff:
+                continue
+            if path.name.endswith('.lock'):
+                # Opening a lock file truncates it, so an old mtime means it is idle;
+                # still skip it if some worker holds it right now
+                with open(path, 'rb') as lock_file:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue
+                    path.unlink()
+            else:
+                path.unlink()
+            removed += 1
+        except FileNotFoundError:
+            # Another worker swept it first
+            continue
+    return removed
+
+async def _sweep_render_cache_periodically():
+    while True:
+        removed = await asyncio.to_thread(_sweep_render_cache)
+        if removed:
+            logger.info(f"Removed {removed} expired caption cache files")
+        await asyncio.sleep(RENDER_CACHE_SWEEP_SECONDS)
+
+async def _refresh_catalog_snapshot() -> Optional[list]:
+    """Fetch and publish the template catalog, unless another worker is already doing so
+
+    Returns None without waiting when the refresh lock is busy or upstream failed
+    recently, so callers serve the stale snapshot or the fallback instead of queueing.
+    """
+    async with _shared_lock(CATALOG_SNAPSHOT_PATH, wait=False) as acquired:
+        if not acquired or _is_fresh(CATALOG_FAILURE_PATH, CATALOG_FAILURE_TTL_SECONDS):
+            return None
+
+        # Another worker may have refreshed the snapshot just before we took the lock
+        templates = _read_catalog_snapshot()
+        if templates is not None:
+            return templates
+
+        try:
+            templates = await _fetch_imgflip_templates()
+        except Exception:
+            await asyncio.to_thread(_atomic_write, CATALOG_FAILURE_PATH, b'')
+            raise
+        await asyncio.to_thread(_write_catalog_snapshot, templates)
+        return templates
+
+async def _fetch_imgflip_templates() -> list:
+    """Fetch popular meme templates from the Imgflip API"""
+    async with httpx.AsyncClient() as client:
+        response = await client.get(f"{IMGFLIP_API_BASE}/get_memes")
+
+    if response.status_code != 200:
+        raise HTTPException(status_code=500, detail="Failed to fetch meme templates")
+
+    data = response.json()
+
+    if not data.get('success'):
+        raise HTTPException(status_code=500, detail="Imgflip API returned error")
+
+    # Transform the data to match our frontend format
+    templates = []
+    for meme in data['data']['memes'][:20]:  # Limit to first 20 templates
+        template = MemeTemplate(
+            id=meme['id'],
+            name=meme['name'],
+            url=meme['url'],
+            width=meme['width'],
+            height=meme['height'],
+            box_count=meme['box_count']
+        )
+        templates.append(template.dict())
+
+    return templates
+
+def _write_memes_version(version: int) -> int:
+    try:
+        current = int(MEMES_VERSION_PATH.read_text())
+    except (FileNotFoundError, ValueError):
+        current = -1
+
+    if version > current:
+        _atomic_write(MEMES_VERSION_PATH, str(version).encode('utf-8'))
+        return version
+
+    # A concurrent write already published something at least as new; keep it fresh
+    os.utime(MEMES_VERSION_PATH)
+    return current
+
+async def _publish_memes_version(version: int) -> int:
+    """Publish a memes version to all workers unless a newer one is already published"""
+    async with _shared_lock(MEMES_VERSION_PATH):
+        return await asyncio.to_thread(_write_memes_version, version)
+
+async def _bump_memes_version() -> int:
+    """Advance the memes version after a create or delete"""
+    counter = await db.counters.find_one_and_update(
+        {'_id': 'memes'}, {'$inc': {'v': 1}}, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return await _publish_memes_version(counter['v'])
+
+async def _memes_version() -> int:
+    """Current memes version, read from the shared cache when fresh"""
+    if _is_fresh(MEMES_VERSION_PATH, MEMES_VERSION_TTL_SECONDS):
+        try:
+            return int(MEMES_VERSION_PATH.read_text())
+        except (FileNotFoundError, ValueError):
+            pass
+    # Re-read the counter so writes made outside this host are picked up
+    counter = await db.counters.find_one({'_id': 'memes'})
+    return await _publish_memes_version(counter['v'] if counter else 0)
+
+# Conditional GET and compression helpers
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Check If-None-Match against a representation ETag"""
+    header = request.headers.get('if-none-match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+
+    # If-None-Match uses weak comparison, so W/ prefixes are ignored
+    return any(candidate.strip().removeprefix('W/') == etag for candidate in header.split(','))
+
+def _negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best content-coding the client accepts, preferring brotli"""
+    accepted = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+def _representation(request: Request, base_etag: str):
+    """Negotiated content-coding and the strong ETag of the representation it selects
+
+    The body for a given version and coding is always the same bytes, so the
+    ETag is known before the payload is loaded and a 304 carries exactly the
+    validator a 200 would have sent.
+    """
+    encoding = _negotiate_encoding(request.headers.get('accept-encoding', ''))
+    if encoding is None:
+        return None, base_etag
+    return encoding, f'{base_etag[:-1]}-{encoding}"'
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={'ETag': etag, 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'})
+
+def _json_response(payload: dict, etag: str, encoding: Optional[str]) -> Response:
+    """Serialize a JSON payload with its ETag, compressing it when large enough"""
+    body = json.dumps(jsonable_encoder(payload), ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+    headers = {'ETag': etag, 'Vary': 'Accept-Encoding', 'Cache-Control': 'no-cache'}
+
+    if encoding and len(body) >= COMPRESSION_MIN_BYTES:
+        if encoding == 'br':
+            body = brotli.compress(body, quality=5)
+        else:
+            body = gzip.compress(body, compresslevel=6)
+        headers['Content-Encoding'] = encoding
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# Meme event feed helpers
+class _FeedSubscriber:
+    """A connected SSE client with a bounded event buffer"""
+
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=SSE_SUBSCRIBER_BUFFER)
+        self.overflowed = False
+
+def _fan_out(event: dict):
+    """Hand an event to every connected subscriber on this worker"""
+    for subscriber in list(_feed_subscribers):
+        try:
+            subscriber.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Drop slow clients instead of buffering without bound; they resync on reconnect
+            subscriber.overflowed = True
+            _feed_subscribers.discard(subscriber)
+
+def _meme_event_data(meme: dict) -> dict:
+    """Event payload for a meme, identical whichever path observed the write"""
+    data = {key: meme[key] for key in ('id', 'template_id', 'url', 'page_url', 'created_at') if key in meme}
+    data['_id'] = str(meme['_id'])
+    return data
+
+def _write_meme_event_record(event_type: str, data: dict):
+    """Assign the next sequence number and append the event to the log; call with the log locked"""
+    try:
+        epoch, seq = MEME_EVENTS_SEQ_PATH.read_text().split()
+        seq = int(seq)
+    except (FileNotFoundError, ValueError):
+        # A fresh or wiped log starts a new epoch so old event ids are never reused
+        epoch, seq = uuid.uuid4().hex[:8], 0
+    seq += 1
+
+    # Claim the sequence number first: a crash before the append shows up as a gap, not a reused id
+    _atomic_write(MEME_EVENTS_SEQ_PATH, f"{epoch} {seq}".encode('utf-8'))
+    record = {'epoch': epoch, 'seq': seq, 'event': event_type, 'data': jsonable_encoder(data)}
+    with open(MEME_EVENTS_LOG_PATH, 'ab') as log:
+        log.write(json.dumps(record, separators=(",", ":")).encode('utf-8') + b'\n')
+        size = log.tell()
+
+    if size > SSE_LOG_MAX_BYTES:
+        # Keep enough for replay; tailers see the new inode and skip what they already published
+        lines = MEME_EVENTS_LOG_PATH.read_bytes().splitlines(keepends=True)
+        _atomic_write(MEME_EVENTS_LOG_PATH, b''.join(lines[-SSE_REPLAY_BUFFER:]))
+
+async def _append_meme_event(event_type: str, data: dict):
+    """Append an event to this host's shared event log and publish it locally"""
+    async with _shared_lock(MEME_EVENTS_LOG_PATH):
+        await asyncio.to_thread(_write_meme_event_record, event_type, data)
+
+    _consume_meme_events()
+
+async def _publish_meme_write(event_type: str, data: dict):
+    """Advance the memes version and log the event after a committed write
+
+    Both are best-effort: the write already happened, so failing the request here
+    would only make the client retry into a duplicate meme or a 404.
+    """
+    try:
+        await _bump_memes_version()
+    except Exception as e:
+        logger.warning(f"Could not publish memes version after {event_type}: {str(e)}")
+
+    try:
+        await _append_meme_event(event_type, data)
+    except Exception as e:
+        logger.warning(f"Could not log {event_type} event: {str(e)}")
+
+def _publish_logged_event(record: dict):
+    """Record a logged event for replay and fan it out, resetting clients if events were missed"""
+    epoch, seq = record['epoch'], record['seq']
+    if epoch == _feed_state['epoch'] and seq <= _feed_state['seq']:
+        return
+
+    if _feed_state['epoch'] is not None and (epoch != _feed_state['epoch'] or seq != _feed_state['seq'] + 1):
+        # The log was wiped or rotated past us; history can no longer be replayed faithfully
+        _feed_history.clear()
+        _fan_out({'id': f"{epoch}-{seq - 1}", 'seq': seq - 1, 'event': 'reset', 'data': {}})
+
+    _feed_state['epoch'] = epoch
+    _feed_state['seq'] = seq
+    event = {'id': f"{epoch}-{seq}", 'seq': seq, 'event': record['event'], 'data': record['data']}
+    _feed_history.append(event)
+    _fan_out(event)
+
+def _consume_meme_events():
+    """Publish events appended to the shared log since this worker last read it"""
+    try:
+        log = open(MEME_EVENTS_LOG_PATH, 'rb')
+    except FileNotFoundError:
+        return
+
+    with log:
+        stat = os.fstat(log.fileno())
+        if stat.st_ino != _feed_state['log_inode'] or stat.st_size < _feed_state['log_position']:
+            # Rotated: read the new file from the start, already published events are skipped
+            _feed_state['log_inode'] = stat.st_ino
+            _feed_state['log_position'] = 0
+        log.seek(_feed_state['log_position'])
+        chunk = log.read()
+
+    # Only consume complete lines; a partial one is picked up on the next read
+    end = chunk.rfind(b'\n') + 1
+    _feed_state['log_position'] += end
+    for line in chunk[:end].splitlines():
+        if line:
+            _publish_logged_event(json.loads(line))
+
+async def _tail_meme_events():
+    """Pick up events other workers on this host appended to the shared log"""
+    while True:
+        try:
+            _consume_meme_events()
+        except Exception as e:
+            logger.warning(f"Error reading meme event log: {str(e)}")
+        await asyncio.sleep(SSE_POLL_SECONDS)
+
+def _replay_meme_events(last_event_id: Optional[str]) -> Optional[list]:
+    """Events after `last_event_id`, or None if the client must refetch the full list"""
+    if not last_event_id:
+        return []
+
+    epoch, _, seq = last_event_id.partition('-')
+    if epoch != (_feed_state['epoch'] or '') or not seq.isdigit():
+        return None
+
+    seq = int(seq)
+    oldest = _feed_history[0]['seq'] if _feed_history else _feed_state['seq'] + 1
+    if seq < oldest - 1 or seq > _feed_state['seq']:
+        return None
+    return [event for event in _feed_history if event['seq'] > seq]
+
+def _format_sse(event: dict) -> str:
+    data = json.dumps(jsonable_encoder(event['data']), separators=(",", ":"))
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {data}\n\n"
+
+async def _log_remote_change(change: dict):
+    """Copy a change made on another host into this host's event log"""
+    if change['operationType'] == 'insert':
+        meme = change['fullDocument']
+        if meme.get('origin_host') != HOST_ID:
+            await _append_meme_event('meme_created', _meme_event_data(meme))
+    elif change['operationType'] == 'delete':
+        meme = change.get('fullDocumentBeforeChange')
+        if meme is None:
+            # Without a pre-image we cannot tell clients which meme went away
+            await _append_meme_event('reset', {})
+        elif meme.get('deleted_by') != HOST_ID:
+            await _append_meme_event('meme_deleted', {'id': meme['id'], '_id': str(meme['_id'])})
+
+async def _watch_meme_changes():
+    """Forward other hosts' meme writes from a Mongo change stream, from one worker per host"""
+    try:
+        hello = await db.command('hello')
+    except PyMongoError as e:
+        logger.warning(f"Could not inspect Mongo deployment, meme events cover this host only: {str(e)}")
+        return
+    if 'setName' not in hello:
+        logger.info("Mongo is not a replica set, meme events cover writes made on this host only")
+        return
+    _feed_state['scope'] = 'all'
+
+    watch_options = {}
+    try:
+        await db.command('collMod', 'memes', changeStreamPreAndPostImages={'enabled': True})
+        watch_options['full_document_before_change'] = 'whenAvailable'
+    except PyMongoError as e:
+        logger.warning(f"Change stream pre-images unavailable, remote deletes will be sent as reset events: {str(e)}")
+
+    watcher_lock = open(MEME_EVENTS_WATCHER_PATH, 'wb')
+    resume_token = None
+    backoff = 1
+    failures = 0
+    try:
+        while True:
+            try:
+                fcntl.flock(watcher_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Another worker on this host is watching; take over if it goes away
+                await asyncio.sleep(30)
+                continue
+
+            try:
+                async with db.memes.watch(start_after=resume_token, **watch_options) as stream:
+                    logger.info("Forwarding meme changes from other hosts via the Mongo change stream")
+                    backoff = 1
+                    failures = 0
+                    async for change in stream:
+                        await _log_remote_change(change)
+                        resume_token = stream.resume_token
+            except PyMongoError as e:
+                failures += 1
+                if failures >= 3 and resume_token is not None:
+                    # The resume point may have fallen out of the oplog; start fresh and tell clients
+                    resume_token = None
+                    await _append_meme_event('reset', {})
+                logger.warning(f"Meme change stream failed, retrying in {backoff}s: {str(e)}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+    finally:
+        watcher_lock.close()
+
+# Preview render helpers
+def _lru_get(cache: OrderedDict, key):
+    with _preview_cache_lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+def _lru_put(cache: OrderedDict, key, value, max_size: int):
+    with _preview_cache_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > max_size:
+            cache.popitem(last=False)
+
+async def _fetch_image_bytes(url: str, http: Optional[httpx.AsyncClient] = None) -> bytes:
+    """Load image bytes from a data URL or an allowlisted HTTPS URL, up to IMAGE_FETCH_MAX_BYTES"""
+    if url.startswith('data:'):
+        # Base64 is 4/3 the size of the bytes it encodes
+        if len(url) * 3 // 4 > IMAGE_FETCH_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Image is too large")
+        header, separator, payload = url.partition(',')
+        if not separator or not header.endswith(';base64'):
+            raise HTTPException(status_code=400, detail="Image data URL must be base64 encoded")
+        try:
+            return base64.b64decode(payload, validate=True)
+        except (binascii.Error, ValueError):
+            raise HTTPException(status_code=400, detail="Image data URL is not valid base64")
+
+    parsed = urlparse(url)
+    if parsed.scheme != 'https' or parsed.hostname not in IMAGE_FETCH_HOSTS:
+        raise HTTPException(status_code=400, detail="Image URL is not allowed")
+
+    if http is None:
+        async with httpx.AsyncClient(timeout=IMAGE_FETCH_TIMEOUT_SECONDS) as client:
+            return await _fetch_image_bytes(url, client)
+
+    # Redirects are not followed, so the allowlist check above covers every request made
+    async with http.stream('GET', url, follow_redirects=False) as response:
+        if response.status_code != 200:
+            raise HTTPException(status_code=502, detail="Failed to fetch image")
+
+        chunks = []
+        size = 0
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            if size > IMAGE_FETCH_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="Image is too large")
+            chunks.append(chunk)
+    return b''.join(chunks)
+
+def _open_image(raw: bytes) -> Image.Image:
+    """Open an image, refusing pixel counts that would be expensive to decode"""
+    try:
+        img = Image.open(io.BytesIO(raw))
+    except UnidentifiedImageError:
+        raise HTTPException(status_code=400, detail="Image format is not supported")
+    except Image.DecompressionBombError:
+        raise HTTPException(status_code=413, detail="Image has too many pixels")
+    # Pillow only raises above twice MAX_IMAGE_PIXELS, so check the header size ourselves
+    if img.width * img.height > Image.MAX_IMAGE_PIXELS:
+        raise HTTPException(status_code=413, detail="Image has too many pixels")
+    return img
+
+def _template_url(template_id: str) -> Optional[str]:
+    """Look up a template image URL in the shared catalog or the fallback templates"""
+    templates = (_read_catalog_snapshot() or _catalog_cache['templates'] or []) + FALLBACK_TEMPLATES
+    for template in templates:
+        if template['id'] == template_id:
+            return template['url']
+    return None
+
+def _downscale_image(raw: bytes, max_size: int) -> Image.Image:
+    """Decode an image straight to (roughly) the working resolution"""
+    img = _open_image(raw)
+    # Lets the JPEG decoder skip DCT detail we would throw away anyway
+    img.draft('RGB', (max_size, max_size))
+    try:
+        img = img.convert('RGB')
+    except OSError:
+        # Pillow only decodes pixel data here, so truncated or corrupt files surface now
+        raise HTTPException(status_code=400, detail="Image data is corrupt")
+    img.thumbnail((max_size, max_size), Image.Resampling.BILINEAR)
+    return img
+
+async def _preview_base_image(source: tuple, max_size: int, load_url) -> Image.Image:
+    """Downscaled base image for previews, fetched and decoded once per source and size
+
+    `source` identifies the image (template id, upload id or data URL digest) and
+    `load_url` is only awaited on a cache miss, so repeat previews skip the lookup.
+    """
+    key = (source, max_size)
+    base = _lru_get(_preview_base_cache, key)
+    if base is None:
+        raw = await _fetch_image_bytes(await load_url())
+        base = await asyncio.to_thread(_downscale_image, raw, max_size)
+        _lru_put(_preview_base_cache, key, base, PREVIEW_BASE_CACHE_SIZE)
+    return base
+
+@lru_cache(maxsize=64)
+def _load_font(font_family: str, size: int):
+    for name in (f"{font_family}.ttf", "DejaVuSans-Bold.ttf"):
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size)
+
+def _text_layer(box: MemeTextBox, font_family: str, font_px: int, stroke_width: int):
+    """Rasterized text for one box, with its offset from the anchor point"""
+    key = (box.text, font_family, font_px, stroke_width, box.color, box.outline_color)
+    layer = _lru_get(_preview_layer_cache, key)
+    if layer is None:
+        font = _load_font(font_family, font_px)
+        # Anchor "ms" matches the editor canvas: centered horizontally, on the baseline
+        left, top, right, bottom = font.getbbox(box.text, stroke_width=stroke_width, anchor='ms')
+        image = Image.new('RGBA', (max(1, right - left), max(1, bottom - top)), (0, 0, 0, 0))
+        ImageDraw.Draw(image).text(
+            (-left, -top), box.text, font=font, fill=box.color, anchor='ms',
+            stroke_width=stroke_width, stroke_fill=box.outline_color
+        )
+        layer = (image, left, top)
+        _lru_put(_preview_layer_cache, key, layer, PREVIEW_LAYER_CACHE_SIZE)
+    return layer
+
+def _render_preview(base: Image.Image, request: PreviewMemeRequest) -> bytes:
+    """Composite cached text layers onto the base image and encode it quickly"""
+    scale = base.width / PREVIEW_REFERENCE_WIDTH
+    font_px = max(1, round(request.font_size * scale))
+    stroke_width = max(1, round(2 * scale))
+
+    preview = base.copy()
+    for box in request.boxes:
+        if not box.text.strip():
+            continue
+        layer, left, top = _text_layer(box, request.font_family, font_px, stroke_width)
+        # Box positions are percentages of the canvas, as sent by the editor
+        x = round(base.width / 2 + (box.x - 50) * base.width / 100)
+        y = round(base.height * box.y / 100)
+        preview.paste(layer, (x + left, y + top), layer)
+
+    buffer = io.BytesIO()
+    if request.format == 'webp':
+        preview.save(buffer, format='WEBP', quality=request.quality, method=0)
+    else:
+        preview.save(buffer, format='JPEG', quality=request.quality, subsampling=2)
+    return buffer.getvalue()
+
+# Perceptual hash helpers
+def _dhash(raw: bytes) -> int:
+    """64-bit difference hash: one bit per horizontally adjacent pixel pair on a 9x8 grayscale thumbnail"""
+    img = _open_image(raw)
+    img.draft('L', (64, 64))
+    pixels = np.asarray(img.convert('L').resize((9, 8), Image.Resampling.BILINEAR), dtype=np.int16)
+    bits = pixels[:, 1:] > pixels[:, :-1]
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big')
+
+def _hamming_distances(phash: int, hashes: np.ndarray) -> np.ndarray:
+    """Hamming distances from one hash to an array of uint64 hashes"""
+    xor = np.bitwise_xor(hashes, np.uint64(phash))
+    return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+class _BKTree:
+    """BK-tree over 64-bit perceptual hashes using Hamming distance
+
+    Nodes are [hash, values, children] lists keyed by distance to keep a
+    million-entry tree reasonably compact.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, phash: int, value):
+        self.size += 1
+        if self.root is None:
+            self.root = [phash, [value], {}]
+            return
+
+        node = self.root
+        while True:
+            distance = (node[0] ^ phash).bit_count()
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [phash, [value], {}]
+                return
+            node = child
+
+    def query(self, phash: int, max_distance: int) -> list:
+        """All (distance, value) pairs within max_distance of phash"""
+        matches = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node_hash, values, children = stack.pop()
+            distance = (node_hash ^ phash).bit_count()
+            if distance <= max_distance:
+                matches.extend((distance, value) for value in values)
+            # Triangle inequality: only subtrees at distance +/- max_distance can match
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return matches
+
+# Flat or smoothly graded images all hash to these, so they say nothing about similarity
+_DEGENERATE_HASHES = (0, 2**64 - 1)
+
+# In-memory index of upload hashes, values are (upload_id, blob_id)
+_upload_index = _BKTree()
+# Uploads newer than `watermark` are loaded on refresh; `recent_ids` holds uploads already
+# indexed inside the overlap window so they are not added twice
+_upload_index_state = {'build_task': None, 'watermark': None, 'recent_ids': {}}
+
+def _index_upload(upload_id: str, blob_id: str, phash: int, uploaded_at: Optional[datetime]):
+    # Degenerate hashes would match every other flat image, so they are never indexed
+    if upload_id in _upload_index_state['recent_ids'] or phash in _DEGENERATE_HASHES:
+        return
+    _upload_index.add(phash, (upload_id, blob_id))
+    if uploaded_at is not None:
+        _upload_index_state['recent_ids'][upload_id] = uploaded_at
+
+async def _load_new_upload_hashes():
+    """Add hashes of uploads stored since the last load, including other workers' uploads"""
+    query = {'phash': {'$exists': True}}
+    watermark = _upload_index_state['watermark']
+    if watermark is not None:
+        # Overlap a little, since uploaded_at is set before the insert becomes visible
+        query['uploaded_at'] = {'$gte': watermark - timedelta(seconds=UPLOAD_INDEX_OVERLAP_SECONDS)}
+
+    projection = {'_id': 0, 'id': 1, 'blob_id': 1, 'phash': 1, 'uploaded_at': 1}
+    cursor = db.uploads.find(query, projection=projection, batch_size=UPLOAD_INDEX_BATCH_SIZE)
+    while True:
+        batch = await cursor.to_list(length=UPLOAD_INDEX_BATCH_SIZE)
+        if not batch:
+            break
+        for upload in batch:
+            uploaded_at = upload.get('uploaded_at')
+            _index_upload(upload['id'], upload.get('blob_id', upload['id']), int(upload['phash'], 16), uploaded_at)
+            if uploaded_at is not None and (watermark is None or uploaded_at > watermark):
+                watermark = uploaded_at
+        # The first load can cover millions of uploads; let requests run between batches
+        await asyncio.sleep(0)
+
+    _upload_index_state['watermark'] = watermark
+    if watermark is not None:
+        cutoff = watermark - timedelta(seconds=UPLOAD_INDEX_OVERLAP_SECONDS)
+        _upload_index_state['recent_ids'] = {
+            upload_id: uploaded_at for upload_id, uploaded_at in _upload_index_state['recent_ids'].items()
+            if uploaded_at >= cutoff
+        }
+
+async def _build_upload_index():
+    """Load existing upload hashes into the in-memory index, then keep it up to date"""
+    sha256_indexed = False
+    while True:
+        if not sha256_indexed:
+            # Only speeds up duplicate lookups, so startup does not wait on it
+            try:
+                await db.uploads.create_index('sha256')
+                sha256_indexed = True
+            except PyMongoError as e:
+                logger.warning(f"Could not create uploads sha256 index: {str(e)}")
+        try:
+            await _load_new_upload_hashes()
+        except PyMongoError as e:
+            logger.warning(f"Error refreshing upload hash index: {str(e)}")
+        await asyncio.sleep(UPLOAD_INDEX_REFRESH_SECONDS)
+
+async def _upload_data_url(upload_id: str) -> str:
+    """Data URL of an upload, following blob_id to the stored copy"""
+    upload = await db.uploads.find_one({"id": upload_id}, projection={'_id': 0, 'blob_id': 1, 'data_url': 1})
+    if not upload:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if 'data_url' not in upload:
+        upload = await db.uploads.find_one({"id": upload.get('blob_id', upload_id)}, projection={'_id': 0, 'data_url': 1})
+    if not upload or 'data_url' not in upload:
+        raise HTTPException(status_code=404, detail="Upload image not found")
+    return upload['data_url']
+
+async def _find_duplicate_blob(digest: str) -> Optional[dict]:
+    """Stored upload with byte-identical contents, if any"""
+    return await db.uploads.find_one({'sha256': digest, 'data_url': {'$exists': True}}, projection={'_id': 0, 'id': 1, 'data_url': 1})
+
+def _find_similar_upload(phash: Optional[int]) -> Optional[str]:
+    """Closest indexed upload within UPLOAD_SIMILAR_DISTANCE bits, if any"""
+    if phash is None or phash in _DEGENERATE_HASHES:
+        return None
+    matches = _upload_index.query(phash, UPLOAD_SIMILAR_DISTANCE)
+    if not matches:
+        return None
+    _, (similar_id, _) = min(matches, key=lambda match: match[0])
+    return similar_id
+
+async def _template_hashes() -> dict:
+    """dHashes of the current templates, fetched and hashed once per catalog version"""
+    templates = _read_catalog_snapshot() or _catalog_cache['templates']
+    digest = _catalog_cache['digest']
+    if templates is None:
+        templates, digest = FALLBACK_TEMPLATES, FALLBACK_TEMPLATES_DIGEST
+    if _template_hash_cache['digest'] == digest:
+        return _template_hash_cache['hashes']
+
+    semaphore = asyncio.Semaphore(8)
+
+    async def hash_template(template):
+        async with semaphore:
+            try:
+                raw = await _fetch_image_bytes(template['url'])
+                return template, await asyncio.to_thread(_dhash, raw)
+            except Exception as e:
+                logger.warning(f"Could not hash template {template['id']}: {str(e)}")
+                return template, None
+
+    results = await asyncio.gather(*(hash_template(template) for template in templates))
+    hashes = {
+        template['id']: (template, phash) for template, phash in results
+        if phash is not None and phash not in _DEGENERATE_HASHES
+    }
+    _template_hash_cache['digest'] = digest
+    _template_hash_cache['hashes'] = hashes
+    return hashes
+
+# Gallery export helpers
+class _ZipStream:
+    """Write-only file object that hands ZIP output to a streaming response
+
+    It has no tell() or seek(), so zipfile writes entries with data
+    descriptors instead of seeking back to patch local headers.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def write(self, data) -> int:
+        self.buffer += data
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        chunk = bytes(self.buffer)
+        self.buffer.clear()
+        return chunk
+
+def _export_entry_name(meme: dict) -> str:
+    """Archive file name for a meme, ordered by creation time"""
+    url = meme['url']
+    if url.startswith('data:'):
+        extension = mimetypes.guess_extension(url[5:].split(';', 1)[0]) or '.jpg'
+    else:
+        extension = Path(urlparse(url).path).suffix or '.jpg'
+    return f"{meme['created_at']:%Y%m%d-%H%M%S}-{meme['id']}{extension}"
+
+async def _fetch_export_image(http: httpx.AsyncClient, semaphore: asyncio.Semaphore, meme: dict) -> Optional[bytes]:
+    async with semaphore:
+        try:
+            return await _fetch_image_bytes(meme['url'], http)
+        except Exception as e:
+            logger.warning(f"Skipping meme {meme['id']} in export: {str(e)}")
+            return None
+
+async def _write_export_batch(archive: zipfile.ZipFile, stream: _ZipStream, http: httpx.AsyncClient,
+                              semaphore: asyncio.Semaphore, batch: list):
+    """Fetch one batch of meme images concurrently and yield their archive entries"""
+    images = await asyncio.gather(*(_fetch_export_image(http, semaphore, meme) for meme in batch))
+    for meme, image in zip(batch, images):
+        if image is None:
+            continue
+        info = zipfile.ZipInfo(_export_entry_name(meme), date_time=meme['created_at'].timetuple()[:6])
+        archive.writestr(info, image)
+        yield stream.drain()
+
+async def _export_memes_zip():
+    """Yield a ZIP archive of all memes, one batch of images in memory at a time"""
+    stream = _ZipStream()
+    semaphore = asyncio.Semaphore(EXPORT_FETCH_CONCURRENCY)
+    cursor = db.memes.find({}, projection={'_id': 0, 'id': 1, 'url': 1, 'created_at': 1}) \
+        .sort("created_at", -1).batch_size(EXPORT_BATCH_SIZE)
+
+    async with httpx.AsyncClient(timeout=IMAGE_FETCH_TIMEOUT_SECONDS) as http:
+        # Images are already compressed, so entries are stored rather than deflated
+        with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+            batch = []
+            async for meme in cursor:
+                batch.append(meme)
+                if len(batch) == EXPORT_BATCH_SIZE:
+                    async for chunk in _write_export_batch(archive, stream, http, semaphore, batch):
+                        yield chunk
+                    batch = []
+
+            async for chunk in _write_export_batch(archive, stream, http, semaphore, batch):
+                yield chunk
+
+    # Closing the archive writes the central directory
+    yield stream.drain()
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
@@ -99,114 +1153,34 @@ async def get_status_checks():
     return [StatusCheck(**status_check) for status_check in status_checks]
 
 @api_router.get("/memes/templates")
-async def get_meme_templates():
-    """Get popular meme templates from Imgflip API"""
+async def get_meme_templates(request: Request):
+    """Get popular meme templates, shared across workers via the catalog snapshot"""
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{IMGFLIP_API_BASE}/get_memes")
-            
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail="Failed to fetch meme templates")
-            
-        data = response.json()
-        
-        if not data.get('success'):
-            raise HTTPException(status_code=500, detail="Imgflip API returned error")
-        
-        # Transform the data to match our frontend format
-        templates = []
-        for meme in data['data']['memes'][:20]:  # Limit to first 20 templates
-            template = MemeTemplate(
-                id=meme['id'],
-                name=meme['name'],
-                url=meme['url'],
-                width=meme['width'],
-                height=meme['height'],
-                box_count=meme['box_count']
-            )
-            templates.append(template)
-        
-        return {"success": True, "data": templates}
+        templates = _read_catalog_snapshot()
+
+        if templates is None:
+            templates = await _refresh_catalog_snapshot()
         
     except Exception as e:
         logger.error(f"Error fetching meme templates: {str(e)}")
+        templates = None
+
+    if templates is None:
+        # Serve the expired snapshot while it cannot be refreshed
+        templates = _read_catalog_snapshot(allow_stale=True)
+
+    if templates is not None:
+        digest = _catalog_cache['digest']
+    else:
         # Return fallback templates if API fails
-        fallback_templates = [
-            {
-                "id": "181913649",
-                "name": "Drake Hotline Bling",
-                "url": "https://i.imgflip.com/30b1gx.jpg",
-                "width": 1200,
-                "height": 1200,
-                "box_count": 2
-            },
-            {
-                "id": "87743020",
-                "name": "Two Buttons",
-                "url": "https://i.imgflip.com/1g8my4.jpg",
-                "width": 600,
-                "height": 908,
-                "box_count": 3
-            },
-            {
-                "id": "112126428",
-                "name": "Distracted Boyfriend",
-                "url": "https://i.imgflip.com/1ur9b0.jpg",
-                "width": 1200,
-                "height": 800,
-                "box_count": 3
-            },
-            {
-                "id": "131087935",
-                "name": "Running Away Balloon",
-                "url": "https://i.imgflip.com/24y43o.jpg",
-                "width": 761,
-                "height": 1024,
-                "box_count": 5
-            },
-            {
-                "id": "124822590",
-                "name": "Left Exit 12 Off Ramp",
-                "url": "https://i.imgflip.com/22bdq6.jpg",
-                "width": 804,
-                "height": 767,
-                "box_count": 3
-            },
-            {
-                "id": "135256802",
-                "name": "Epic Handshake",
-                "url": "https://i.imgflip.com/28j0te.jpg",
-                "width": 900,
-                "height": 645,
-                "box_count": 3
-            },
-            {
-                "id": "4087833",
-                "name": "Waiting Skeleton",
-                "url": "https://i.imgflip.com/2fm6x.jpg",
-                "width": 298,
-                "height": 403,
-                "box_count": 2
-            },
-            {
-                "id": "102156234",
-                "name": "Mocking Spongebob",
-                "url": "https://i.imgflip.com/1otk96.jpg",
-                "width": 502,
-                "height": 353,
-                "box_count": 2
-            },
-            {
-                "id": "93895088",
-                "name": "Expanding Brain",
-                "url": "https://i.imgflip.com/1jwhww.jpg",
-                "width": 857,
-                "height": 1202,
-                "box_count": 4
-            }
-        ]
-        
-        return {"success": True, "data": fallback_templates}
+        templates = FALLBACK_TEMPLATES
+        digest = FALLBACK_TEMPLATES_DIGEST
+
+    encoding, etag = _representation(request, f'"templates-{digest[:16]}"')
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    return _json_response({"success": True, "data": templates}, etag, encoding)
 
 @api_router.post("/memes/create")
 async def create_meme(request: CreateMemeRequest):
@@ -229,37 +1203,48 @@ async def create_meme(request: CreateMemeRequest):
         for i, box in enumerate(request.boxes):
             data[f'text{i}'] = box.text
             
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{IMGFLIP_API_BASE}/caption_image",
-                data=data
-            )
-        
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail="Failed to create meme")
-            
-        result = response.json()
-        
-        if not result.get('success'):
-            raise HTTPException(
-                status_code=400, 
-                detail=result.get('error_message', 'Unknown error from Imgflip API')
-            )
+        # Identical captions share one Imgflip call across all workers on this host
+        cache_path = _render_cache_path(request)
+        async with _shared_lock(cache_path):
+            if _is_fresh(cache_path, RENDER_CACHE_TTL_SECONDS):
+                meme_data = json.loads(cache_path.read_bytes())
+            else:
+                async with httpx.AsyncClient() as client:
+                    response = await client.post(
+                        f"{IMGFLIP_API_BASE}/caption_image",
+                        data=data
+                    )
+                
+                if response.status_code != 200:
+                    raise HTTPException(status_code=500, detail="Failed to create meme")
+                    
+                result = response.json()
+                
+                if not result.get('success'):
+                    raise HTTPException(
+                        status_code=400, 
+                        detail=result.get('error_message', 'Unknown error from Imgflip API')
+                    )
+                
+                meme_data = result['data']
+                await asyncio.to_thread(_atomic_write, cache_path, json.dumps(meme_data).encode('utf-8'))
         
         # Store the meme in database
         meme_doc = {
             'id': str(uuid.uuid4()),
             'template_id': request.template_id,
-            'url': result['data']['url'],
-            'page_url': result['data']['page_url'],
-            'created_at': datetime.utcnow()
+            'url': meme_data['url'],
+            'page_url': meme_data['page_url'],
+            'created_at': datetime.utcnow(),
+            'origin_host': HOST_ID
         }
         
         await db.memes.insert_one(meme_doc)
+        await _publish_meme_write('meme_created', _meme_event_data(meme_doc))
         
         return CreateMemeResponse(
             success=True,
-            data=result['data']
+            data=meme_data
         )
         
     except HTTPException:
@@ -268,6 +1253,55 @@ async def create_meme(request: CreateMemeRequest):
         logger.error(f"Error creating meme: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/memes/preview")
+async def preview_meme(request: PreviewMemeRequest):
+    """Render a fast, reduced-resolution meme preview for live editing"""
+    try:
+        if request.format not in ('jpeg', 'webp'):
+            raise HTTPException(status_code=400, detail="Preview format must be 'jpeg' or 'webp'")
+
+        # Only uploaded images (data URLs) and catalog templates are rendered, never arbitrary URLs
+        if request.image_url and not request.image_url.startswith('data:'):
+            raise HTTPException(status_code=400, detail="image_url must be a data URL; use template_id for templates")
+
+        if request.image_url:
+            source = ('data', hashlib.sha256(request.image_url.encode('utf-8')).hexdigest())
+
+            async def load_url():
+                return request.image_url
+        elif request.upload_id:
+            source = ('upload', request.upload_id)
+
+            async def load_url():
+                return await _upload_data_url(request.upload_id)
+        elif request.template_id:
+            source = ('template', request.template_id)
+
+            async def load_url():
+                url = _template_url(request.template_id)
+                if not url:
+                    raise HTTPException(status_code=400, detail="Unknown template_id")
+                return url
+        else:
+            raise HTTPException(status_code=400, detail="A template_id, upload_id or image_url is required")
+
+        start = time.perf_counter()
+        base = await _preview_base_image(source, request.max_size, load_url)
+        content = await asyncio.to_thread(_render_preview, base, request)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        return Response(
+            content=content,
+            media_type=f"image/{request.format}",
+            headers={'Cache-Control': 'no-store', 'Server-Timing': f"render;dur={elapsed_ms:.1f}"}
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error rendering meme preview: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.post("/memes/create-custom")
 async def create_custom_meme(request: CustomMemeRequest):
     """Create a custom meme with uploaded image"""
@@ -290,29 +1324,93 @@ async def create_custom_meme(request: CustomMemeRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/memes")
-async def get_user_memes():
+async def get_user_memes(request: Request):
     """Get user's created memes"""
     try:
-        memes = await db.memes.find().sort("created_at", -1).to_list(50)
+        # Answer revalidations from the shared version file without querying the memes
+        encoding, etag = _representation(request, f'"memes-{await _memes_version()}"')
+        if _etag_matches(request, etag):
+            return _not_modified(etag)
+
+        memes = await db.memes.find({}, projection={'origin_host': 0, 'deleted_by': 0}).sort("created_at", -1).to_list(50)
         
         # Convert ObjectId to string for JSON serialization
         for meme in memes:
             meme['_id'] = str(meme['_id'])
             
-        return {"success": True, "data": memes}
+        return _json_response({"success": True, "data": memes}, etag, encoding)
         
     except Exception as e:
         logger.error(f"Error fetching user memes: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/memes/stream")
+async def stream_memes(request: Request):
+    """Stream meme create/delete events as Server-Sent Events"""
+    last_event_id = request.headers.get('last-event-id') or request.query_params.get('last_event_id')
+
+    # Replay and subscribe without awaiting in between so no event falls in the gap
+    replay = _replay_meme_events(last_event_id)
+    resync_id = f"{_feed_state['epoch'] or ''}-{_feed_state['seq']}"
+    scope = _feed_state['scope']
+    subscriber = _FeedSubscriber()
+    _feed_subscribers.add(subscriber)
+
+    async def event_stream():
+        try:
+            yield "retry: 3000\n\n"
+            # "host" means writes made by other hosts sharing this database are not included
+            yield f'event: scope\ndata: {{"scope":"{scope}"}}\n\n'
+            if replay is None:
+                # Too far behind to replay; the client should refetch GET /api/memes
+                yield f"id: {resync_id}\nevent: reset\ndata: {{}}\n\n"
+            else:
+                for event in replay:
+                    yield _format_sse(event)
+
+            while True:
+                if subscriber.overflowed:
+                    yield f"id: {_feed_state['epoch'] or ''}-{_feed_state['seq']}\nevent: reset\ndata: {{}}\n\n"
+                    return
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield _format_sse(event)
+        finally:
+            _feed_subscribers.discard(subscriber)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@api_router.get("/memes/export")
+async def export_memes():
+    """Download all memes as a ZIP archive, streamed as it is built"""
+    filename = f"memes-{datetime.utcnow():%Y%m%d-%H%M%S}.zip"
+    return StreamingResponse(
+        _export_memes_zip(),
+        media_type="application/zip",
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
 @api_router.delete("/memes/{meme_id}")
 async def delete_meme(meme_id: str):
     """Delete a meme"""
     try:
-        result = await db.memes.delete_one({"id": meme_id})
+        # Tag the meme first so the change stream on this host knows the delete is already logged
+        deleted = await db.memes.find_one_and_update(
+            {"id": meme_id}, {"$set": {'deleted_by': HOST_ID}}, projection={'_id': 1, 'id': 1}
+        )
+        result = await db.memes.delete_one({"_id": deleted['_id']}) if deleted else None
         
-        if result.deleted_count == 0:
+        if result is None or result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Meme not found")
+
+        await _publish_meme_write('meme_deleted', {'id': deleted['id'], '_id': str(deleted['_id'])})
             
         return {"success": True, "message": "Meme deleted successfully"}
         
@@ -333,27 +1431,54 @@ async def upload_image(file: UploadFile = File(...)):
         # Read the file content
         contents = await file.read()
         
-        # Convert to base64 for easy storage/transmission
-        base64_image = base64.b64encode(contents).decode('utf-8')
-        data_url = f"data:{file.content_type};base64,{base64_image}"
+        try:
+            phash = await asyncio.to_thread(_dhash, contents)
+        except Exception:
+            # Formats Pillow cannot decode are stored without a hash
+            phash = None
         
-        # Store in database
+        digest = hashlib.sha256(contents).hexdigest()
         upload_doc = {
             'id': str(uuid.uuid4()),
             'filename': file.filename,
             'content_type': file.content_type,
-            'data_url': data_url,
+            'sha256': digest,
             'uploaded_at': datetime.utcnow()
         }
         
+        duplicate = await _find_duplicate_blob(digest)
+        if duplicate:
+            # Byte-identical images share one stored copy
+            upload_doc['blob_id'] = duplicate['id']
+            data_url = duplicate['data_url']
+        else:
+            # Convert to base64 for easy storage/transmission
+            base64_image = base64.b64encode(contents).decode('utf-8')
+            data_url = f"data:{file.content_type};base64,{base64_image}"
+            upload_doc['blob_id'] = upload_doc['id']
+            upload_doc['data_url'] = data_url
+        
+        if phash is not None:
+            upload_doc['phash'] = f"{phash:016x}"
+            # Near-duplicates keep their own bytes (a dHash ignores details like caption text) and are only linked
+            similar_to = _find_similar_upload(phash)
+            if similar_to:
+                upload_doc['similar_to'] = similar_to
+        
+        # Store in database
         await db.uploads.insert_one(upload_doc)
         
+        if phash is not None:
+            _index_upload(upload_doc['id'], upload_doc['blob_id'], phash, upload_doc['uploaded_at'])
+        
         return {
             "success": True,
             "data": {
                 "id": upload_doc['id'],
                 "filename": file.filename,
-                "url": data_url
+                "url": data_url,
+                "blob_id": upload_doc['blob_id'],
+                "similar_to": upload_doc.get('similar_to')
             }
         }
         
@@ -363,6 +1488,74 @@ async def upload_image(file: UploadFile = File(...)):
         logger.error(f"Error uploading file: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/uploads/{upload_id}/similar")
+async def get_similar_uploads(
+    upload_id: str,
+    max_distance: int = Query(default=SIMILAR_MAX_DISTANCE, ge=0, le=16),
+    limit: int = Query(default=20, ge=1, le=100)
+):
+    """Find uploads and meme templates that look like an uploaded image"""
+    try:
+        upload = await db.uploads.find_one({"id": upload_id}, projection={'_id': 0, 'phash': 1, 'blob_id': 1, 'data_url': 1})
+        
+        if upload is None:
+            raise HTTPException(status_code=404, detail="Upload not found")
+        
+        if 'phash' in upload:
+            phash = int(upload['phash'], 16)
+        else:
+            # Uploads stored before hashing was introduced are hashed on first lookup
+            blob_id = upload.get('blob_id', upload_id)
+            blob = upload if 'data_url' in upload else await db.uploads.find_one({"id": blob_id}, projection={'data_url': 1})
+            if not blob or 'data_url' not in blob:
+                raise HTTPException(status_code=404, detail="Upload image not found")
+            phash = await asyncio.to_thread(_dhash, await _fetch_image_bytes(blob['data_url']))
+            await db.uploads.update_one({"id": upload_id}, {"$set": {'phash': f"{phash:016x}", 'blob_id': blob_id}})
+            _index_upload(upload_id, blob_id, phash, None)
+        
+        if phash in _DEGENERATE_HASHES:
+            # A flat image is "similar" to every other flat image, so there is nothing useful to report
+            return {"success": True, "data": {"uploads": [], "templates": []}}
+        
+        matches = sorted(
+            # Guard against an upload indexed twice, e.g. a legacy doc hashed here and by a refresh
+            set((distance, value) for distance, value in _upload_index.query(phash, max_distance) if value[0] != upload_id)
+        )[:limit]
+        
+        filenames = {}
+        if matches:
+            cursor = db.uploads.find({"id": {"$in": [value[0] for _, value in matches]}}, projection={'_id': 0, 'id': 1, 'filename': 1})
+            filenames = {doc['id']: doc.get('filename') for doc in await cursor.to_list(limit)}
+        
+        similar_uploads = [
+            {"id": similar_id, "filename": filenames.get(similar_id), "blob_id": blob_id, "distance": distance}
+            for distance, (similar_id, blob_id) in matches
+        ]
+        
+        template_hashes = await _template_hashes()
+        similar_templates = []
+        if template_hashes:
+            entries = list(template_hashes.values())
+            distances = _hamming_distances(phash, np.array([template_phash for _, template_phash in entries], dtype=np.uint64))
+            for (template, _), distance in zip(entries, distances.tolist()):
+                if distance <= max_distance:
+                    similar_templates.append({**template, "distance": distance})
+            similar_templates.sort(key=lambda template: template['distance'])
+        
+        return {
+            "success": True,
+            "data": {
+                "uploads": similar_uploads,
+                "templates": similar_templates[:limit]
+            }
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error finding similar uploads: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -381,6 +1574,24 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def start_render_cache_sweep():
+    _render_cache_state['sweep_task'] = asyncio.create_task(_sweep_render_cache_periodically())
+
+@app.on_event("startup")
+async def start_meme_event_feed():
+    _feed_state['tail_task'] = asyncio.create_task(_tail_meme_events())
+    _feed_state['watch_task'] = asyncio.create_task(_watch_meme_changes())
+
+@app.on_event("startup")
+async def start_upload_index():
+    # Large collections take a while to index; serve requests while it fills in.
+    # The index then refreshes every UPLOAD_INDEX_REFRESH_SECONDS to pick up other workers' uploads.
+    _upload_index_state['build_task'] = asyncio.create_task(_build_upload_index())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in (_render_cache_state['sweep_task'], _feed_state['tail_task'], _feed_state['watch_task'], _upload_index_state['build_task']):
+        if task is not None:
+            task.cancel()
     client.close()
\ No newline at end of file
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Backend Benchmarks for Meme Generator
+Measures payload sizes and latencies of backend endpoints against a running server
+"""
+
+import requests
+import statistics
+import sys
+import time
+import os
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv('/app/frontend/.env')
+
+# Get backend URL from frontend environment
+BACKEND_URL = os.environ.get('REACT_APP_BACKEND_URL', 'http://localhost:8001')
+API_BASE = f"{BACKEND_URL}/api"
+
+print(f"Benchmarking backend at: {API_BASE}")
+
+def measure_wire_bytes(path, headers=None):
+    """Fetch an endpoint and return (status, bytes on the wire, elapsed ms, response headers)"""
+    start = time.perf_counter()
+    response = requests.get(f"{API_BASE}{path}", headers=headers or {}, stream=True)
+    # Read the raw body without letting requests undo the content-coding
+    body = response.raw.read(decode_content=False)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return response.status_code, len(body), elapsed_ms, response.headers
+
+def benchmark_listing_bytes_on_wire(path):
+    """Compare identity, gzip, brotli and conditional (304) responses for a listing endpoint"""
+    print(f"\n=== Bytes on the wire: {path} ===")
+    results = {}
+
+    for label, encoding in [('identity', 'identity'), ('gzip', 'gzip'), ('br', 'br')]:
+        status, size, elapsed_ms, headers = measure_wire_bytes(path, {'Accept-Encoding': encoding})
+        results[label] = size
+        print(f"{label:>9}: {status} {size:>8} bytes {elapsed_ms:7.1f} ms "
+              f"(Content-Encoding: {headers.get('content-encoding', '-')}, ETag: {headers.get('etag')})")
+
+    _, _, _, headers = measure_wire_bytes(path, {'Accept-Encoding': 'gzip'})
+    etag = headers.get('etag')
+    if etag:
+        status, size, elapsed_ms, _ = measure_wire_bytes(
+            path, {'Accept-Encoding': 'gzip', 'If-None-Match': etag}
+        )
+        results['not_modified'] = size
+        print(f"{'304':>9}: {status} {size:>8} bytes {elapsed_ms:7.1f} ms")
+        if status != 304:
+            print("❌ Conditional GET did not return 304")
+    else:
+        print("❌ No ETag returned")
+
+    return results
+
+def benchmark_preview_latency(template_id, iterations=50):
+    """Simulate live typing against POST /api/memes/preview and report latency percentiles"""
+    print(f"\n=== Preview latency: template {template_id} ===")
+    server_ms = []
+    round_trip_ms = []
+    sizes = []
+    text = "When the preview renders"
+
+    for i in range(iterations):
+        # Only the bottom box changes, like a user typing into one text field
+        payload = {
+            "template_id": template_id,
+            "boxes": [
+                {"text": "Top text stays put", "x": 50, "y": 15, "width": 200, "height": 50},
+                {"text": text[:i % len(text) + 1], "x": 50, "y": 90, "width": 200, "height": 50}
+            ],
+            "font_size": 36
+        }
+        start = time.perf_counter()
+        response = requests.post(f"{API_BASE}/memes/preview", json=payload)
+        round_trip_ms.append((time.perf_counter() - start) * 1000)
+
+        if response.status_code != 200:
+            print(f"❌ Preview failed with status {response.status_code}")
+            return {}
+
+        timing = response.headers.get('server-timing', '')
+        if 'dur=' in timing:
+            server_ms.append(float(timing.split('dur=')[1]))
+        sizes.append(len(response.content))
+
+    # Skip the first request, which fetches and decodes the base image
+    server_ms, round_trip_ms = server_ms[1:], round_trip_ms[1:]
+    results = {
+        'server_p50_ms': statistics.median(server_ms),
+        'server_p95_ms': statistics.quantiles(server_ms, n=20)[-1],
+        'round_trip_p50_ms': statistics.median(round_trip_ms),
+        'mean_bytes': statistics.mean(sizes),
+    }
+    for name, value in results.items():
+        print(f"{name:>18}: {value:8.1f}")
+    return results
+
+def benchmark_phash_index(count=1_000_000, queries=200):
+    """Build a BK-tree over random 64-bit hashes and compare query latency with a NumPy linear scan"""
+    print(f"\n=== Perceptual hash index: {count} hashes ===")
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+    from server import _BKTree, _hamming_distances
+
+    rng = np.random.default_rng(42)
+    hashes = rng.integers(0, 2**64, size=count, dtype=np.uint64)
+    values = hashes.tolist()
+
+    start = time.perf_counter()
+    tree = _BKTree()
+    for i, phash in enumerate(values):
+        tree.add(phash, i)
+    build_s = time.perf_counter() - start
+    print(f"{'build':>18}: {build_s:8.2f} s")
+
+    results = {'build_s': build_s}
+    # Query near existing hashes by flipping a couple of bits, as a re-encoded upload would
+    probes = [values[i] ^ 0b11 for i in rng.integers(0, count, size=queries).tolist()]
+    for max_distance in (2, 6, 10):
+        tree_ms = []
+        for probe in probes:
+            start = time.perf_counter()
+            tree.query(probe, max_distance)
+            tree_ms.append((time.perf_counter() - start) * 1000)
+        results[f'bktree_d{max_distance}_p50_ms'] = statistics.median(tree_ms)
+
+    scan_ms = []
+    for probe in probes[:20]:
+        start = time.perf_counter()
+        np.nonzero(_hamming_distances(probe, hashes) <= 10)
+        scan_ms.append((time.perf_counter() - start) * 1000)
+    results['numpy_scan_p50_ms'] = statistics.median(scan_ms)
+
+    for name, value in results.items():
+        if name != 'build_s':
+            print(f"{name:>18}: {value:8.2f} ms")
+    return results
+
+def run_all_benchmarks():
+    """Run all backend benchmarks"""
+    print("🚀 Starting Backend Benchmarks")
+    print("=" * 60)
+
+    results = {}
+    results['templates'] = benchmark_listing_bytes_on_wire('/memes/templates')
+    results['memes'] = benchmark_listing_bytes_on_wire('/memes')
+    results['preview'] = benchmark_preview_latency("181913649")
+    results['phash_index'] = benchmark_phash_index()
+
+    return results
+
+if __name__ == "__main__":
+    run_all_benchmarks()
@@ -8,8 +8,10 @@ import requests
 import json
 import base64
 import io
+import zipfile
 from PIL import Image
 import os
+import uuid
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -92,6 +94,62 @@ def test_meme_templates():
         print(f"❌ Templates endpoint error: {str(e)}")
         return False, []
 
+def test_templates_conditional_get():
+    """Test ETag / If-None-Match handling on GET /api/memes/templates"""
+    print("\n=== Testing Templates Conditional GET ===")
+    try:
+        response = requests.get(f"{API_BASE}/memes/templates")
+        etag = response.headers.get('etag')
+        print(f"ETag: {etag}")
+        
+        if not etag:
+            print("❌ Templates response missing ETag")
+            return False
+        
+        response = requests.get(f"{API_BASE}/memes/templates", headers={'If-None-Match': etag})
+        print(f"Status Code: {response.status_code}")
+        
+        if response.status_code == 304 and not response.content:
+            print("✅ Templates conditional GET returns 304 Not Modified")
+            return True
+        else:
+            print("❌ Expected empty 304 response for matching ETag")
+            return False
+    except Exception as e:
+        print(f"❌ Templates conditional GET error: {str(e)}")
+        return False
+
+def test_memes_conditional_get():
+    """Test ETag / If-None-Match handling on GET /api/memes, with and without gzip"""
+    print("\n=== Testing Memes Conditional GET ===")
+    try:
+        for encoding in ['identity', 'gzip']:
+            headers = {'Accept-Encoding': encoding}
+            response = requests.get(f"{API_BASE}/memes", headers=headers)
+            etag = response.headers.get('etag')
+            print(f"{encoding} ETag: {etag}")
+            
+            if response.status_code != 200 or not etag:
+                print("❌ Memes response missing ETag")
+                return False
+            
+            response = requests.get(f"{API_BASE}/memes", headers={**headers, 'If-None-Match': etag})
+            print(f"{encoding} Status Code: {response.status_code}")
+            
+            if response.status_code != 304 or response.content:
+                print("❌ Expected empty 304 response for matching ETag")
+                return False
+            
+            if response.headers.get('etag') != etag:
+                print("❌ 304 response did not repeat the representation ETag")
+                return False
+        
+        print("✅ Memes conditional GET returns 304 with matching ETags")
+        return True
+    except Exception as e:
+        print(f"❌ Memes conditional GET error: {str(e)}")
+        return False
+
 def test_meme_creation_without_credentials(template_id):
     """Test POST /api/memes/create without Imgflip credentials"""
     print("\n=== Testing Meme Creation Without Credentials ===")
@@ -141,6 +199,86 @@ def test_meme_creation_without_credentials(template_id):
         print(f"❌ Meme creation test error: {str(e)}")
         return False
 
+def test_meme_preview(template_id):
+    """Test POST /api/memes/preview endpoint and its validation"""
+    print("\n=== Testing Meme Preview ===")
+    try:
+        boxes = [{"text": "Preview Top Text", "x": 50, "y": 15, "width": 200, "height": 50}]
+        
+        response = requests.post(f"{API_BASE}/memes/preview", json={"template_id": template_id, "boxes": boxes})
+        print(f"Status Code: {response.status_code}")
+        print(f"Content-Type: {response.headers.get('content-type')}")
+        
+        if response.status_code != 200 or response.headers.get('content-type') != 'image/jpeg':
+            print("❌ Preview did not return a JPEG image")
+            return False
+        
+        preview = Image.open(io.BytesIO(response.content))
+        print(f"Preview size: {preview.size}")
+        if preview.format != 'JPEG':
+            print("❌ Preview body is not a valid JPEG")
+            return False
+        
+        response = requests.post(f"{API_BASE}/memes/preview", json={"template_id": template_id, "boxes": boxes, "format": "gif"})
+        print(f"Bad format Status Code: {response.status_code}")
+        if response.status_code != 400:
+            print("❌ Expected 400 for unsupported preview format")
+            return False
+        
+        response = requests.post(f"{API_BASE}/memes/preview", json={"boxes": boxes})
+        print(f"No image Status Code: {response.status_code}")
+        if response.status_code != 400:
+            print("❌ Expected 400 when neither template_id nor image_url is given")
+            return False
+        
+        response = requests.post(f"{API_BASE}/memes/preview", json={"image_url": "http://169.254.169.254/latest/meta-data/", "boxes": boxes})
+        print(f"Remote URL Status Code: {response.status_code}")
+        if response.status_code != 400:
+            print("❌ Expected 400 for a non-data image_url")
+            return False
+        
+        # Malformed data URLs are client errors, not server failures
+        for label, image_url in [
+            ('no comma', 'data:image/png;base64'),
+            ('not base64', 'data:image/png;base64,not*base64!'),
+            ('not an image', 'data:image/png;base64,' + base64.b64encode(b'not an image').decode('utf-8')),
+        ]:
+            response = requests.post(f"{API_BASE}/memes/preview", json={"image_url": image_url, "boxes": boxes})
+            print(f"Malformed data URL ({label}) Status Code: {response.status_code}")
+            if response.status_code != 400:
+                print(f"❌ Expected 400 for a malformed data URL ({label})")
+                return False
+        
+        print("✅ Meme preview working correctly")
+        return True
+    except Exception as e:
+        print(f"❌ Meme preview error: {str(e)}")
+        return False
+
+def test_upload_preview(upload_data):
+    """Test POST /api/memes/preview with an upload_id instead of a data URL"""
+    print("\n=== Testing Upload Preview ===")
+    try:
+        boxes = [{"text": "Preview Bottom Text", "x": 50, "y": 85, "width": 200, "height": 50}]
+        
+        response = requests.post(f"{API_BASE}/memes/preview", json={"upload_id": upload_data['id'], "boxes": boxes})
+        print(f"Status Code: {response.status_code}")
+        if response.status_code != 200 or response.headers.get('content-type') != 'image/jpeg':
+            print("❌ Preview by upload_id did not return a JPEG image")
+            return False
+        
+        response = requests.post(f"{API_BASE}/memes/preview", json={"upload_id": str(uuid.uuid4()), "boxes": boxes})
+        print(f"Unknown upload Status Code: {response.status_code}")
+        if response.status_code != 404:
+            print("❌ Expected 404 for an unknown upload_id")
+            return False
+        
+        print("✅ Upload preview working correctly")
+        return True
+    except Exception as e:
+        print(f"❌ Upload preview error: {str(e)}")
+        return False
+
 def test_file_upload():
     """Test POST /api/upload endpoint"""
     print("\n=== Testing File Upload Endpoint ===")
@@ -185,6 +323,74 @@ def test_file_upload():
         print(f"❌ File upload error: {str(e)}")
         return False, None
 
+def create_textured_image():
+    """Create a noisy test image; unlike a flat image it has a meaningful perceptual hash and differs on every run"""
+    img = Image.effect_noise((100, 100), 64).convert('RGB')
+    img_buffer = io.BytesIO()
+    img.save(img_buffer, format='PNG')
+    return img, img_buffer.getvalue()
+
+def upload_image_bytes(filename, content):
+    """Upload PNG bytes and return the response data, or None on failure"""
+    response = requests.post(f"{API_BASE}/upload", files={'file': (filename, io.BytesIO(content), 'image/png')})
+    print(f"Upload {filename} Status Code: {response.status_code}")
+    return response.json()['data'] if response.status_code == 200 else None
+
+def test_duplicate_upload_and_similar(upload_data):
+    """Test upload deduplication and GET /api/uploads/{id}/similar"""
+    print("\n=== Testing Duplicate Upload and Similar Lookup ===")
+    try:
+        image, content = create_textured_image()
+        original = upload_image_bytes('textured.png', content)
+        duplicate = upload_image_bytes('textured-copy.png', content)
+        
+        if not original or not duplicate:
+            print("❌ Textured upload failed")
+            return False
+        
+        print(f"Original blob: {original.get('blob_id')}, duplicate blob: {duplicate.get('blob_id')}")
+        if duplicate.get('blob_id') != original.get('blob_id'):
+            print("❌ Identical upload did not reuse the stored image")
+            return False
+        
+        # A visually similar but different image must keep its own bytes
+        image.putpixel((50, 50), (255, 255, 255) if image.getpixel((50, 50)) != (255, 255, 255) else (0, 0, 0))
+        variant_buffer = io.BytesIO()
+        image.save(variant_buffer, format='PNG')
+        variant = upload_image_bytes('textured-variant.png', variant_buffer.getvalue())
+        
+        if not variant or variant.get('blob_id') == original.get('blob_id') or variant['url'] == original['url']:
+            print("❌ Different image was served another upload's stored bytes")
+            return False
+        
+        response = requests.get(f"{API_BASE}/uploads/{duplicate['id']}/similar")
+        print(f"Similar Status Code: {response.status_code}")
+        
+        if response.status_code != 200:
+            print(f"❌ Similar lookup failed with status {response.status_code}")
+            return False
+        
+        similar = response.json()['data']
+        similar_ids = [upload['id'] for upload in similar['uploads']]
+        print(f"Similar uploads: {len(similar_ids)}, similar templates: {len(similar['templates'])}")
+        
+        if original['id'] not in similar_ids or variant['id'] not in similar_ids:
+            print("❌ Original and variant uploads not both found among similar uploads")
+            return False
+        
+        # Flat images all share one degenerate hash, so they must not match each other
+        response = requests.get(f"{API_BASE}/uploads/{upload_data['id']}/similar")
+        print(f"Flat image Similar Status Code: {response.status_code}")
+        if response.status_code != 200 or response.json()['data']['uploads']:
+            print("❌ Flat image was reported as similar to other uploads")
+            return False
+        
+        print("✅ Identical upload shares the stored image and similar uploads are found")
+        return True
+    except Exception as e:
+        print(f"❌ Duplicate upload test error: {str(e)}")
+        return False
+
 def test_invalid_file_upload():
     """Test file upload with invalid file type"""
     print("\n=== Testing Invalid File Upload ===")
@@ -236,6 +442,78 @@ def test_get_user_memes():
         print(f"❌ Get memes error: {str(e)}")
         return False, []
 
+def read_stream_until(response, wanted, max_lines=10):
+    """Read SSE lines until `wanted` is seen, returning the lines read"""
+    lines = []
+    for line in response.iter_lines(decode_unicode=True):
+        lines.append(line)
+        if line == wanted or len(lines) >= max_lines:
+            break
+    response.close()
+    return lines
+
+def test_meme_event_stream():
+    """Test GET /api/memes/stream Server-Sent Events endpoint"""
+    print("\n=== Testing Meme Event Stream ===")
+    try:
+        response = requests.get(f"{API_BASE}/memes/stream", stream=True, timeout=10)
+        print(f"Status Code: {response.status_code}")
+        print(f"Content-Type: {response.headers.get('content-type')}")
+        
+        if response.status_code != 200 or not response.headers.get('content-type', '').startswith('text/event-stream'):
+            print("❌ Event stream failed or returned wrong content type")
+            return False
+        
+        lines = read_stream_until(response, 'event: scope')
+        print(f"Opening lines: {lines}")
+        
+        if not lines or not lines[0].startswith('retry:') or 'event: scope' not in lines:
+            print("❌ Event stream did not open with retry and scope frames")
+            return False
+        
+        # A Last-Event-ID this server never issued cannot be replayed, so the client must be told to resync
+        response = requests.get(
+            f"{API_BASE}/memes/stream", headers={'Last-Event-ID': 'unknownepoch-1'}, stream=True, timeout=10
+        )
+        lines = read_stream_until(response, 'event: reset')
+        print(f"Resume lines: {lines}")
+        
+        if 'event: reset' in lines:
+            print("✅ Meme event stream working correctly")
+            return True
+        else:
+            print("❌ Unknown Last-Event-ID did not get a reset event")
+            return False
+    except Exception as e:
+        print(f"❌ Meme event stream error: {str(e)}")
+        return False
+
+def test_meme_export():
+    """Test GET /api/memes/export streaming ZIP endpoint"""
+    print("\n=== Testing Meme Export ===")
+    try:
+        response = requests.get(f"{API_BASE}/memes/export")
+        print(f"Status Code: {response.status_code}")
+        print(f"Content-Type: {response.headers.get('content-type')}")
+        
+        if response.status_code == 200 and response.headers.get('content-type') == 'application/zip':
+            archive = zipfile.ZipFile(io.BytesIO(response.content))
+            bad_entry = archive.testzip()
+            print(f"Entries: {len(archive.namelist())}")
+            
+            if bad_entry is None:
+                print("✅ Meme export returns a valid ZIP archive")
+                return True
+            else:
+                print(f"❌ Corrupt entry in export: {bad_entry}")
+                return False
+        else:
+            print("❌ Export failed or returned wrong content type")
+            return False
+    except Exception as e:
+        print(f"❌ Meme export error: {str(e)}")
+        return False
+
 def test_delete_nonexistent_meme():
     """Test DELETE /api/memes/{meme_id} with non-existent ID"""
     print("\n=== Testing Delete Non-existent Meme ===")
@@ -338,6 +616,9 @@ def run_all_tests():
     templates_success, templates = test_meme_templates()
     results['templates'] = templates_success
     
+    # Test 2b: Conditional GET on templates
+    results['templates_conditional_get'] = test_templates_conditional_get()
+    
     # Test 3: Meme creation without credentials
     if templates:
         template_id = templates[0]['id']
@@ -346,10 +627,31 @@ def run_all_tests():
         results['meme_creation_no_creds'] = False
         print("❌ Skipping meme creation test - no templates available")
     
+    # Test 3b: Meme preview
+    if templates:
+        results['meme_preview'] = test_meme_preview(templates[0]['id'])
+    else:
+        results['meme_preview'] = False
+        print("❌ Skipping meme preview test - no templates available")
+    
     # Test 4: File upload
     upload_success, upload_data = test_file_upload()
     results['file_upload'] = upload_success
     
+    # Test 4b: Duplicate upload and similar lookup
+    if upload_data:
+        results['duplicate_upload'] = test_duplicate_upload_and_similar(upload_data)
+    else:
+        results['duplicate_upload'] = False
+        print("❌ Skipping duplicate upload test - no uploaded image available")
+    
+    # Test 4c: Preview of an uploaded image
+    if upload_data:
+        results['upload_preview'] = test_upload_preview(upload_data)
+    else:
+        results['upload_preview'] = False
+        print("❌ Skipping upload preview test - no uploaded image available")
+    
     # Test 5: Invalid file upload
     results['invalid_file_upload'] = test_invalid_file_upload()
     
@@ -357,6 +659,15 @@ def run_all_tests():
     memes_success, memes = test_get_user_memes()
     results['get_memes'] = memes_success
     
+    # Test 6a: Conditional GET on memes
+    results['memes_conditional_get'] = test_memes_conditional_get()
+    
+    # Test 6b: Meme event stream
+    results['meme_event_stream'] = test_meme_event_stream()
+    
+    # Test 6c: Meme export
+    results['meme_export'] = test_meme_export()
+    
     # Test 7: Delete non-existent meme
     results['delete_meme'] = test_delete_nonexistent_meme()
     